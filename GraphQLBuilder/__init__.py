@@ -1,8 +1,54 @@
+import copy
+import hashlib
 import json
 import logging
 import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
 import requests
-from typing import Any, List, Dict, Optional, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Dict, Optional, Iterable, Iterator, Tuple
+
+# Maximum amount of pooled connections of the shared session. Additional parallel connections are opened, but not kept.
+SESSION_POOL_SIZE = 32
+
+
+def create_session(pool_size: Optional[int] = SESSION_POOL_SIZE) -> requests.Session:
+    """Creates a requests Session with a connection pool of pool_size connections per host
+
+    Args:
+        pool_size (int, optional): Maximum amount of pooled connections. Defaults to SESSION_POOL_SIZE.
+
+    Returns:
+        requests.Session: the created Session
+
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _load_state_file(state_file: str) -> Dict[str, Any]:
+    """Loads a JSON state file (e.g. the cursors of sync_incremental). Returns an empty dict, if the file does not exist"""
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state_file(state_file: str, state: Dict[str, Any]) -> None:
+    """Saves a JSON state file. The file is replaced atomically, so a crash never leaves a broken state file"""
+    _tmp_file = state_file + ".tmp"
+    with open(_tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(_tmp_file, state_file)
+
 
 class GraphQLBuilder:
     """This Class is used to build GraphQL Queries and Mutations. All functions are created to help access the GraphQL API of Hasura.io. 
@@ -12,6 +58,25 @@ class GraphQLBuilder:
     The Class is also used to execute the queries and mutations. This is done via the execute_query function.
     """
 
+    def __init__(self) -> None:
+        # Shared HTTP session for execute_many, created lazily and guarded by a lock so the builder can be shared across threads.
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        # Recording of executed queries (see start_recording), also guarded by a lock.
+        self._record_file: Optional[Any] = None
+        self._record_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Session, locks and the recording file cannot be pickled (e.g. for multiprocessing), they are recreated on unpickling
+        state = self.__dict__.copy()
+        for key in ("_session", "_session_lock", "_record_file", "_record_lock"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__()  # type: ignore[misc]
+        self.__dict__.update(state)
+
     def get_path(self, path: List[str], source: Dict[Any, Any], fallback_return_value: Optional[Any] = None) -> Any:
         """Function the traverse a dict via a path and return the value of the last element in the path.
 
@@ -46,6 +111,156 @@ class GraphQLBuilder:
             elif index == len(path) - 1:
                 return tmp
 
+    def _flatten_returning_fields(self, returning_fields: List[str | Dict[str, Any]], prefix: Optional[List[str]] = None) -> List[List[str]]:
+        """Translates returning fields (as used in build_search_qry) into a list of paths, one for each (leaf) column"""
+        prefix = prefix or []
+        _paths = []
+        for field in returning_fields:
+            if isinstance(field, dict):
+                for k, v in field.items():
+                    _paths.extend(self._flatten_returning_fields(v, prefix + [k]))
+            else:
+                _paths.extend(self._parse_selection_string(str(field), prefix))
+
+        # Every column may only appear once
+        _unique = []
+        for path in _paths:
+            if path not in _unique:
+                _unique.append(path)
+        return _unique
+
+    def _parse_selection_string(self, selection: str, prefix: List[str]) -> List[List[str]]:
+        """Translates a selection string like "id, name" or "id authors { id name }" into a list of paths
+
+        Arguments in parentheses are ignored and aliases ("alias: field") are named after the alias, like the key in the response.
+        Returns an empty list (and logs an error), if the braces are not balanced.
+        """
+        _selection = re.sub(r"\([^)]*\)", " ", selection)
+        _selection = re.sub(r"([A-Za-z_]\w*)\s*:\s*[A-Za-z_]\w*", r"\1", _selection)
+        _tokens = re.findall(r"[{}]|[^\s,{}]+", _selection)
+        _paths: List[List[str]] = []
+        _stack = [list(prefix)]
+        _last: Optional[str] = None
+
+        for token in _tokens:
+            if token == "{":
+                if _last is None:
+                    logging.error("Error in _parse_selection_string: Selection without field name in '%s'" % selection)
+                    return []
+                _stack.append(_stack[-1] + [_last])
+                _last = None
+            elif token == "}":
+                if len(_stack) == 1:
+                    logging.error("Error in _parse_selection_string: Unbalanced braces in '%s'" % selection)
+                    return []
+                if _last is not None:
+                    _paths.append(_stack[-1] + [_last])
+                _stack.pop()
+                _last = None
+            else:
+                if _last is not None:
+                    _paths.append(_stack[-1] + [_last])
+                _last = token
+
+        if len(_stack) != 1:
+            logging.error("Error in _parse_selection_string: Unbalanced braces in '%s'" % selection)
+            return []
+        if _last is not None:
+            _paths.append(_stack[-1] + [_last])
+        return _paths
+
+    def _flatten_row(self, row: Any, prefix: str, target: Dict[str, Any]) -> None:
+        """Flattens a (nested) result row into target, using dotted keys for nested objects"""
+        for k, v in row.items():
+            name = f"{prefix}.{k}" if prefix else k
+            if isinstance(v, dict):
+                self._flatten_row(v, name, target)
+            else:
+                target[name] = v
+
+    def _extract_path(self, value: Any, path: List[str]) -> Any:
+        """Returns the value of path in value. If a stage of the path is a list (array relationship), a list of values is returned"""
+        for index, knot in enumerate(path):
+            if isinstance(value, list):
+                return [self._extract_path(v, path[index:]) for v in value]
+            if not isinstance(value, dict):
+                return None
+            value = value.get(knot)
+        return value
+
+    def get_columns_from_result(
+        self,
+        source: Dict[str, Any] | Iterable[Dict[str, Any]],
+        typename: Optional[str] = None,
+        returning_fields: Optional[List[str | Dict[str, Any]]] = None,
+        as_dataframe: Optional[bool] = False,
+    ) -> Any:
+        """Converts the rows of a search result into columns (dict of lists) or a pandas DataFrame.
+
+        Nested objects are flattened into dotted column names, e.g. {"name": {"firstname": "foo"}} becomes the column "name.firstname".
+        If a nested field is a list (array relationship), the column contains a list of the nested values for each row.
+
+        If returning_fields is given (same structure as in build_search_qry, also strings like "authors { id }"), the columns are built from it, so also empty results have all columns.
+        Otherwise the columns are taken from the rows itself, missing values are filled with None.
+
+        Args:
+            source (Dict[str, Any] | Iterable[Dict[str, Any]]): The result of execute_query or any iterable of rows (e.g. a generator)
+            typename (str, optional): Name of the Query Type. Required, if source is the result of execute_query
+            returning_fields (List[Any], optional): Returning fields as used in build_search_qry. Defaults to None.
+            as_dataframe (bool, optional): Return a pandas DataFrame instead of a dict. Requires pandas. Defaults to False.
+
+        Returns:
+            Dict[str, List[Any]]: Columns as dict of lists
+            or pandas.DataFrame: if as_dataframe is True
+
+        Examples:
+            >>> get_columns_from_result({"data": {"foo": [{"id": 1, "name": {"first": "a"}}]}}, "foo")
+            {"id": [1], "name.first": ["a"]}
+
+        """
+        if isinstance(source, dict):
+            rows = self.get_path(["data", typename], source, fallback_return_value=[]) if typename else []
+        else:
+            rows = source
+
+        columns: Dict[str, List[Any]] = {}
+        if returning_fields:
+            _paths: List[Tuple[str, List[str]]] = [(".".join(p), p) for p in self._flatten_returning_fields(returning_fields)]
+            for name, _ in _paths:
+                columns[name] = []
+            for row in rows:
+                for name, path in _paths:
+                    columns[name].append(self._extract_path(row, path))
+        else:
+            count = 0
+            for row in rows:
+                _flat: Dict[str, Any] = {}
+                self._flatten_row(row, "", _flat)
+                for name, v in _flat.items():
+                    if name not in columns:
+                        # New column, fill the previous rows with None
+                        columns[name] = [None] * count
+                    columns[name].append(v)
+                count += 1
+                for name, values in columns.items():
+                    if len(values) < count:
+                        values.append(None)
+
+            # A nested object which is null in some rows creates a column for the object itself, which is not needed next to its fields
+            for name in [n for n in columns if any(other.startswith(n + ".") for other in columns)]:
+                if all(v is None for v in columns[name]):
+                    del columns[name]
+
+        if as_dataframe:
+            try:
+                import pandas
+            except ImportError:
+                logging.error("get_columns_from_result: pandas is not installed!")
+                raise
+            return pandas.DataFrame(columns)
+
+        return columns
+
     def build_graphQL_mutation_objects_from_list(
         self, source_data: List[Any], key: str, itemtype: str, return_as_list: Optional[bool] = False
     ) -> str | List[Any]:
@@ -112,6 +327,11 @@ class GraphQLBuilder:
             
         You can also use point seperated strings for dicts like 'status.agreed' to map nested dicts.
 
+        For nested inserts (Hasura relationships), set the type of the relationship field in the TypeSchema to a nested TypeSchema (dict).
+        A dict value is inserted as object relationship, a list of dicts as array relationship, e.g. {authors: {data: [{name: "foo"}]}}.
+        The nested TypeSchema can contain the key "_on_conflict" with a dict like {"constraint": "authors_pkey", "update_columns": ["name"]}.
+        Custom mappings and the other options are only applied to the top level.
+
         Args:
             source_data (dict): Source Data as Dict
             typeschema (dict): The TypeSchema as Dict
@@ -180,7 +400,12 @@ class GraphQLBuilder:
                 else:
                     # check for NoneType, else just skip. Will be null in DB, if the field is nullable. If not, this will throw an error on insert
                     if v != None:
-                        if typeschema.get(k) == "Int":
+                        # Nested TypeSchema = object (dict) or array (list) relationship
+                        if isinstance(typeschema.get(k), dict):
+                            _nested = self._build_nested_insert_object(v, typeschema[k])
+                            if _nested:
+                                _items.append("%s: %s" % (k, _nested))
+                        elif typeschema.get(k) == "Int":
                             try:
                                 _items.append("%s: %d" % (k, int(v)))
                             # Try to convert emptry strings to int - We just ignore it, since it then appears as null in data
@@ -223,21 +448,37 @@ class GraphQLBuilder:
 
         return "{%s}" % ", ".join(_items)
 
-    def build_search_qry(
-        self, typename: str, qry_filter: str, returning_fields: List[str | Dict[str, Any]], limit: Optional[int] = 10
-    ) -> str:
-        """Builds a Search Query with optional filter and returns it
+    def _build_nested_insert_object(self, source_data: Any, typeschema: Dict[str, Any]) -> str:
+        """Builds the nested insert object of a relationship, e.g. {data: [{...}, {...}], on_conflict: {...}}"""
+        _typeschema = dict(typeschema)
+        _on_conflict = _typeschema.pop("_on_conflict", None)
 
-        Args:
-            typename (str): Name of the Query Type
-            qry_filter (str): Filter as String!! e.g {field: {_eq: "value"}} or {_and: {field_one: {_eq: "foo"}, field_two: {_eq: "bar"}}}
-            returning_fields (List[Any]): List of fields which should be returned. Cannot be empty! For nested fields, use a dict. e.g. {"field": ["subfield_one", "subfield_two"]}
-            limit (int): Amount of returned items, default 10
+        if isinstance(source_data, dict):
+            _data = self.build_graphQL_mutation_objects_from_dict(copy.deepcopy(source_data), _typeschema)
+        elif isinstance(source_data, list):
+            _objects = []
+            for item in source_data:
+                if not isinstance(item, dict):
+                    logging.error("Error - Nested insert items have to be dicts, got %s" % type(item).__name__)
+                    continue
+                _objects.append(self.build_graphQL_mutation_objects_from_dict(copy.deepcopy(item), _typeschema))
+            _data = "[%s]" % ", ".join(_objects)
+        else:
+            logging.error("Error - Nested insert data has to be a dict or list, got %s" % type(source_data).__name__)
+            return ""
 
-        Returns:
-            str: Final Query ready for execution
+        if _on_conflict and not _on_conflict.get("constraint"):
+            logging.error("Error - Nested on_conflict without constraint, on_conflict is ignored")
+        elif _on_conflict:
+            return "{data: %s, on_conflict: {constraint: %s, update_columns: [%s]}}" % (
+                _data,
+                _on_conflict["constraint"],
+                ", ".join(_on_conflict.get("update_columns", [])),
+            )
+        return "{data: %s}" % _data
 
-        """
+    def _prepare_returning_fields(self, returning_fields: List[str | Dict[str, Any]]) -> List[str]:
+        """Translates returning fields (strings or dicts for nested fields) into strings, which can be used in a query"""
 
         def _prepare_dict(field_dict) -> str:
             """Prepares a dict to be used in a query"""
@@ -258,44 +499,161 @@ class GraphQLBuilder:
 
             return "%s { %s }" % (list(field_dict.keys())[0], " ".join(_tmp))
 
+        _prepared_fields = []
+        for field in returning_fields:
+            # We have to check if the field is a dict, since we need to build the query differently
+            # The dict should be fully translated into a string
+            if isinstance(field, dict):
+                _prepared_fields.append(_prepare_dict(field))
+            else:
+                _prepared_fields.append(field)
+        return _prepared_fields
+
+    def build_search_qry(
+        self,
+        typename: str,
+        qry_filter: str,
+        returning_fields: List[str | Dict[str, Any]],
+        limit: Optional[int] = 10,
+        order_by: Optional[str] = "",
+    ) -> str:
+        """Builds a Search Query with optional filter and returns it
+
+        Args:
+            typename (str): Name of the Query Type
+            qry_filter (str): Filter as String!! e.g {field: {_eq: "value"}} or {_and: {field_one: {_eq: "foo"}, field_two: {_eq: "bar"}}}
+            returning_fields (List[Any]): List of fields which should be returned. Cannot be empty! For nested fields, use a dict. e.g. {"field": ["subfield_one", "subfield_two"]}
+            limit (int): Amount of returned items, default 10
+            order_by (str, optional): Sort order as String!! e.g. [{updated_at: asc}, {id: asc}]. Defaults to "".
+
+        Returns:
+            str: Final Query ready for execution
+
+        """
+
         if not returning_fields:
             logging.error(
                 "_build_search_qry error: Returning Fields are empty!")
             return ""
 
         # Build returning fields
-        _prepared_fields = []
-        for field in returning_fields:
-            # We have to check if the field is a dict, since we need to build the query differently
-            # The dict should be fully translated into a string
-            try:
-                if isinstance(field, dict):
-                    _prepared_fields.append(_prepare_dict(field))
-                else:
-                    _prepared_fields.append(field)
-            except Exception as e:
-                logging.error(f"Error in _build_search_qry: {e}")
-                return ""
-
+        try:
+            _prepared_fields = self._prepare_returning_fields(returning_fields)
+        except Exception as e:
+            logging.error(f"Error in _build_search_qry: {e}")
+            return ""
 
         _query = """
             query SearchQuery {
-                %s(limit: %d) {
-                        %s
-                }
-            }
-        """
-        _query_with_filter = """
-            query SearchQuery {
-                %s(limit: %d, where: %s) {
+                %s(%s) {
                         %s
                 }
             }
         """
+        _arguments = ["limit: %d" % limit]
         if qry_filter:
-            return _query_with_filter % (typename, limit, qry_filter, " ".join(_prepared_fields))
+            _arguments.append("where: %s" % qry_filter)
+        if order_by:
+            _arguments.append("order_by: %s" % order_by)
+
+        return _query % (typename, ", ".join(_arguments), " ".join(_prepared_fields))
+
+    def build_aggregate_qry(
+        self,
+        typename: str,
+        qry_filter: Optional[str] = "",
+        count: Optional[bool | List[str]] = True,
+        sum: Optional[List[str]] = [],
+        avg: Optional[List[str]] = [],
+        max: Optional[List[str]] = [],
+        min: Optional[List[str]] = [],
+        groups: Optional[Dict[str, str]] = {},
+        nodes: Optional[List[str | Dict[str, Any]]] = [],
+    ) -> str:
+        """Builds an Aggregate Query (<typename>_aggregate), so only the aggregated values are returned by the server
+
+        Since Hasura has no GROUP BY, groups can be emulated with one aggregate per group. Every group is a filter (combined with qry_filter),
+        which is returned under its name (alias) in the result.
+
+        Args:
+            typename (str): Name of the Query Type (without _aggregate)
+            qry_filter (str, optional): Filter as String!! e.g {field: {_eq: "value"}}. Defaults to "".
+            count (bool | List[str], optional): Return the count. If a list of fields is given, only rows with these fields not null are counted. Defaults to True.
+            sum (List[str], optional): Fields to sum up. Defaults to [].
+            avg (List[str], optional): Fields to average. Defaults to [].
+            max (List[str], optional): Fields to get the maximum of. Defaults to [].
+            min (List[str], optional): Fields to get the minimum of. Defaults to [].
+            groups (Dict[str, str], optional): Name and filter (as String!!) of every group, e.g. {"open": '{status: {_eq: "open"}}'}. Defaults to {}.
+            nodes (List[Any], optional): Fields of the aggregated rows to return, same format as returning_fields in build_search_qry. Defaults to [].
+
+        Returns:
+            str: Final Query ready for execution
+
+        """
+        _aggregate = []
+        if count:
+            if isinstance(count, list):
+                _aggregate.append("count(columns: [%s])" % ", ".join(count))
+            else:
+                _aggregate.append("count")
+        for function, fields in (("sum", sum), ("avg", avg), ("max", max), ("min", min)):
+            if fields:
+                _aggregate.append("%s { %s }" % (function, " ".join(fields)))
+
+        _selection = []
+        if _aggregate:
+            _selection.append("aggregate { %s }" % " ".join(_aggregate))
+        if nodes:
+            try:
+                _selection.append("nodes { %s }" % " ".join(self._prepare_returning_fields(nodes)))
+            except Exception as e:
+                logging.error(f"Error in build_aggregate_qry: {e}")
+                return ""
+
+        if not _selection:
+            logging.error("build_aggregate_qry error: Nothing to aggregate!")
+            return ""
+
+        def _build_field(alias: str, group_filter: str) -> str:
+            _filters = [f for f in (qry_filter, group_filter) if f]
+            _field = "%s_aggregate" % typename
+            if alias:
+                _field = "%s: %s" % (alias, _field)
+            if len(_filters) == 1:
+                _field += "(where: %s)" % _filters[0]
+            elif _filters:
+                _field += "(where: {_and: [%s]})" % ", ".join(_filters)
+            return "%s { %s }" % (_field, " ".join(_selection))
+
+        if groups:
+            _fields = [_build_field(alias, group_filter) for alias, group_filter in groups.items()]
         else:
-            return _query % (typename, limit, " ".join(_prepared_fields))
+            _fields = [_build_field("", "")]
+
+        _query = """
+            query AggregateQuery {
+                %s
+            }
+        """
+        return _query % "\n                ".join(_fields)
+
+    def get_aggregate_from_result(self, result: Dict[str, Any], typename: str, group: Optional[str] = None) -> Dict[str, Any]:
+        """Returns the aggregated values of an executed Aggregate Query (see build_aggregate_qry)
+
+        Args:
+            result (Dict[str, Any]): (JSON) Result of the Query
+            typename (str): Name of the Query Type (without _aggregate)
+            group (str, optional): Name of the group, if groups were used. Defaults to None.
+
+        Returns:
+            Dict[str, Any]: the aggregated values, e.g. {"count": 42, "sum": {"amount": 1337}}. Empty dict, if not found.
+
+        Examples:
+            >>> get_aggregate_from_result({"data": {"foo_aggregate": {"aggregate": {"count": 42}}}}, "foo")
+            {"count": 42}
+
+        """
+        return self.get_path(["data", group or "%s_aggregate" % typename, "aggregate"], result, fallback_return_value={})
 
     def build_insert_mutation_qry(
         self,
@@ -361,6 +719,59 @@ class GraphQLBuilder:
                 " ".join(returning_objects),
             )
 
+    def build_update_many_qry(
+        self,
+        typename: str,
+        updates: List[Dict[str, str]],
+        returning_objects: Optional[List[Any]] = [],
+        chunk_size: Optional[int] = 500,
+    ) -> List[str]:
+        """Builds update_<type>_many mutations, which apply many different updates in one request each
+
+        Every update is a dict with a "where" filter and "_set" and/or "_inc" objects, all as Strings!! The objects can be created with build_graphQL_mutation_objects_from_dict.
+        The updates are split into chunks of chunk_size, so one mutation is created for each chunk.
+
+        Args:
+            typename (str): Name of the Type (without update_ and _many)
+            updates (List[Dict[str, str]]): Updates, e.g. [{"where": '{id: {_eq: 1}}', "_set": '{name: "foo"}'}, {"where": '{id: {_eq: 2}}', "_inc": '{count: 1}'}]
+            returning_objects (List[Any], optional): List of fields to return for every update. Defaults to [] (only affected_rows).
+            chunk_size (int, optional): Maximum amount of updates per mutation. Defaults to 500.
+
+        Returns:
+            List[str]: the generated mutations, one per chunk
+
+        """
+        _query = """
+            mutation UpdateMany {
+                update_%s_many(
+                    updates: [%s]
+                ) {
+                    affected_rows%s
+                }
+            }
+        """
+        _returning = ""
+        if returning_objects:
+            _returning = " returning { %s }" % " ".join(returning_objects)
+
+        _updates = []
+        for update in updates:
+            _args = []
+            for k in ("where", "_set", "_inc"):
+                if update.get(k):
+                    _args.append("%s: %s" % (k, update[k]))
+            # Hasura requires a where clause for every update
+            if not update.get("where"):
+                logging.error("Error in build_update_many_qry: update without where clause!")
+                return []
+            _updates.append("{%s}" % ", ".join(_args))
+
+        _chunk_size = max(1, chunk_size or 1)
+        return [
+            _query % (typename, ", ".join(_updates[i:i + _chunk_size]), _returning)
+            for i in range(0, len(_updates), _chunk_size)
+        ]
+
     def build_delete_qry(self, typename: str, qry_filter: Optional[str] = "") -> str:
         """Builds a delete query
 
@@ -382,14 +793,17 @@ class GraphQLBuilder:
 
         return _query % (typename, qry_filter)
 
-    def execute_query(self, endpoint_url: str, qry: str, bearer_token: Optional[str] = "") -> Dict[str, Any]:
+    def execute_query(
+        self, endpoint_url: "str | EndpointPool", qry: str, bearer_token: Optional[str] = "", variables: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Executes a GraphQL Query and returns the result as a List of Dicts
 
         Args:
-            endpoint_url (str): URL of the GraphQL Endpoint
+            endpoint_url (str | EndpointPool): URL of the GraphQL Endpoint or an EndpointPool, which selects the endpoint
             qry (str): Query to execute
             bearer_token (str, optional): Bearer Token for Auth. Defaults to "".
+            variables (Dict[str, Any], optional): GraphQL variables of the query. Defaults to None.
 
         Returns:
             List[Dict[str, Any]]: (JSON) Result of the Query 
@@ -403,27 +817,660 @@ class GraphQLBuilder:
         if bearer_token != "":
             _headers["Authorization"] = f"{bearer_token}"
 
+        _payload: Dict[str, Any] = {
+            "query": qry,
+        }
+        if variables is not None:
+            _payload["variables"] = variables
+
+        _pool = None
+        if isinstance(endpoint_url, EndpointPool):
+            _pool = endpoint_url
+            endpoint_url = _pool.get_endpoint(qry)
+
+        _start = time.perf_counter()
         try:
             ret = requests.post(
                 endpoint_url,
-                json={
-                    "query": qry,
-                },
+                json=_payload,
                 headers=_headers,
                 verify=False,
             )
         except requests.exceptions.HTTPError as errh:
             logging.error("==> Http Error: %s" % errh)
+            if _pool is not None:
+                _pool.report(endpoint_url, False)
+            self._record_query(_payload, _start, None, str(errh))
             return {}
         except Exception as e:
             logging.error(f"==> {e}")
+            if _pool is not None:
+                _pool.report(endpoint_url, False)
+            self._record_query(_payload, _start, None, str(e))
             return {}
 
+        if _pool is not None:
+            _pool.report(endpoint_url, ret.status_code < 500, time.perf_counter() - _start)
+
         if ret.status_code == 200:
             if ret.json().get("errors") is not None:
                 logging.error(json.dumps(ret.json(), ensure_ascii=False))
+                self._record_query(_payload, _start, ret, "GraphQL error")
                 return {}
+            self._record_query(_payload, _start, ret)
             return ret.json()
         else:
             logging.error(f"   --- ERROR NOT 200 {ret.status_code}")
+            self._record_query(_payload, _start, ret, f"HTTP status code {ret.status_code}")
             return {}
+
+    def execute_update_many(
+        self,
+        endpoint_url: "str | EndpointPool",
+        typename: str,
+        updates: List[Dict[str, str]],
+        bearer_token: Optional[str] = "",
+        chunk_size: Optional[int] = 500,
+    ) -> List[Optional[int]]:
+        """Builds (see build_update_many_qry) and executes update_<type>_many mutations and returns the affected rows of every update
+
+        Args:
+            endpoint_url (str | EndpointPool): URL of the GraphQL Endpoint or an EndpointPool, which selects the endpoint
+            typename (str): Name of the Type (without update_ and _many)
+            updates (List[Dict[str, str]]): Updates with "where", "_set" and/or "_inc" as Strings!!
+            bearer_token (str, optional): Bearer Token for Auth. Defaults to "".
+            chunk_size (int, optional): Maximum amount of updates per request. Defaults to 500.
+
+        Returns:
+            List[Optional[int]]: affected rows per update, in the order of the updates. None, if the update is invalid (no where clause) or its request failed.
+
+        """
+        _chunk_size = max(1, chunk_size or 1)
+        _affected_rows: List[Optional[int]] = [None] * len(updates)
+
+        # Invalid updates are not sent, so they cannot fail the other updates
+        _valid = [index for index, update in enumerate(updates) if update.get("where")]
+        if len(_valid) != len(updates):
+            logging.error("execute_update_many: Skipping %d updates without where clause" % (len(updates) - len(_valid)))
+
+        _queries = self.build_update_many_qry(typename, [updates[i] for i in _valid], chunk_size=_chunk_size)
+        for index, qry in enumerate(_queries):
+            _indices = _valid[index * _chunk_size:(index + 1) * _chunk_size]
+            ret = self.execute_query(endpoint_url, qry, bearer_token=bearer_token)
+            responses = self.get_path(["data", "update_%s_many" % typename], ret)
+            if not isinstance(responses, list) or len(responses) != len(_indices):
+                logging.error("execute_update_many: Failed executing chunk %d of update_%s_many" % (index, typename))
+                continue
+            for i, response in zip(_indices, responses):
+                _affected_rows[i] = response.get("affected_rows") if response else None
+
+        return _affected_rows
+
+    def start_recording(self, record_file: str) -> None:
+        """Starts recording all queries executed via execute_query and execute_many.
+
+        Every query is appended as one JSON line to record_file, containing the query text, variables, duration, status code,
+        request and response size and the error (if any). The recording can be replayed with `python -m GraphQLBuilder.replay`.
+
+        Args:
+            record_file (str): Path to the file to append the recording to
+
+        """
+        with self._record_lock:
+            if self._record_file is not None:
+                self._record_file.close()
+            self._record_file = open(record_file, "a", encoding="utf-8")
+
+    def stop_recording(self) -> None:
+        """Stops recording queries and closes the recording file"""
+        with self._record_lock:
+            if self._record_file is not None:
+                self._record_file.close()
+                self._record_file = None
+
+    def _record_query(
+        self,
+        payload: Dict[str, Any],
+        start: float,
+        ret: Optional[requests.Response],
+        error: Optional[str] = None,
+        response_size: Optional[int] = None,
+    ) -> None:
+        """Appends an executed query to the recording, if recording is active"""
+        if self._record_file is None:
+            return
+        _entry = {
+            "timestamp": time.time(),
+            "query": payload["query"],
+            "variables": payload.get("variables"),
+            "duration": time.perf_counter() - start,
+            "status_code": ret.status_code if ret is not None else None,
+            "request_size": len(json.dumps(payload, ensure_ascii=False).encode("utf-8")),
+            "response_size": response_size if response_size is not None else (len(ret.content) if ret is not None else 0),
+            "error": error,
+        }
+        with self._record_lock:
+            if self._record_file is not None:
+                self._record_file.write(json.dumps(_entry, ensure_ascii=False) + "\n")
+                self._record_file.flush()
+
+    def _get_session(self) -> requests.Session:
+        """Returns the shared session, which is created on first use"""
+        with self._session_lock:
+            if self._session is None:
+                self._session = create_session()
+            return self._session
+
+    def execute_many(
+        self,
+        endpoint_url: "str | EndpointPool",
+        queries: List[str],
+        bearer_token: Optional[str] = "",
+        max_workers: Optional[int] = 4,
+        timeout: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Executes several GraphQL Queries in parallel using a thread pool and a shared connection pool (of SESSION_POOL_SIZE connections).
+
+        In contrast to execute_query, a failed query does not return an empty dict. Instead the result contains an "errors" list
+        (like a GraphQL error response), so every entry can be checked for errors individually.
+
+        Args:
+            endpoint_url (str | EndpointPool): URL of the GraphQL Endpoint or an EndpointPool, which selects the endpoint per query
+            queries (List[str]): Queries to execute
+            bearer_token (str, optional): Bearer Token for Auth. Defaults to "".
+            max_workers (int, optional): Amount of parallel threads. Defaults to 4.
+            timeout (float, optional): Timeout in seconds per query (wall clock, including reading the response). Defaults to None (no timeout).
+
+        Returns:
+            List[Dict[str, Any]]: (JSON) Results of the Queries in the same order as the queries
+
+        """
+        if not queries:
+            return []
+
+        max_workers = max(1, min(max_workers or 1, len(queries)))
+        session = self._get_session()
+        # Narrow endpoint_url before the closure, so the selected URL is always a str
+        _pool: Optional[EndpointPool] = None
+        _endpoint_url = ""
+        if isinstance(endpoint_url, EndpointPool):
+            _pool = endpoint_url
+        else:
+            _endpoint_url = endpoint_url
+
+        _headers = {
+            "content-type": "application/json",
+        }
+
+        if bearer_token != "":
+            _headers["Authorization"] = f"{bearer_token}"
+
+        def _execute(qry: str) -> Dict[str, Any]:
+            _payload = {
+                "query": qry,
+            }
+            _url: str = _pool.get_endpoint(qry) if _pool is not None else _endpoint_url
+            _start = time.perf_counter()
+            _deadline = _start + timeout if timeout is not None else None
+            try:
+                # The body is streamed, so the deadline can also be checked while reading it
+                ret = session.post(
+                    _url,
+                    json=_payload,
+                    headers=_headers,
+                    verify=False,
+                    timeout=timeout,
+                    stream=True,
+                )
+                body = self._read_body(ret, _deadline)
+            except requests.exceptions.Timeout as errt:
+                logging.error("==> Timeout: %s" % errt)
+                if _pool is not None:
+                    _pool.report(_url, False)
+                self._record_query(_payload, _start, None, f"Timeout: {errt}")
+                return {"errors": [{"message": f"Timeout: {errt}"}]}
+            except Exception as e:
+                logging.error(f"==> {e}")
+                if _pool is not None:
+                    _pool.report(_url, False)
+                self._record_query(_payload, _start, None, str(e))
+                return {"errors": [{"message": str(e)}]}
+
+            if body is None:
+                logging.error(f"==> Timeout: Query exceeded {timeout}s")
+                if _pool is not None:
+                    _pool.report(_url, False)
+                self._record_query(_payload, _start, ret, f"Timeout: Query exceeded {timeout}s", 0)
+                return {"errors": [{"message": f"Timeout: Query exceeded {timeout}s"}]}
+
+            if _pool is not None:
+                _pool.report(_url, ret.status_code < 500, time.perf_counter() - _start)
+
+            if ret.status_code != 200:
+                logging.error(f"   --- ERROR NOT 200 {ret.status_code}")
+                self._record_query(_payload, _start, ret, f"HTTP status code {ret.status_code}", len(body))
+                return {"errors": [{"message": f"HTTP status code {ret.status_code}"}]}
+
+            try:
+                result = json.loads(body)
+            except ValueError as e:
+                logging.error(f"==> Invalid JSON response: {e}")
+                self._record_query(_payload, _start, ret, f"Invalid JSON response: {e}", len(body))
+                return {"errors": [{"message": f"Invalid JSON response: {e}"}]}
+
+            if result.get("errors") is not None:
+                logging.error(json.dumps(result, ensure_ascii=False))
+                self._record_query(_payload, _start, ret, "GraphQL error", len(body))
+            else:
+                self._record_query(_payload, _start, ret, response_size=len(body))
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_execute, queries))
+
+    def _read_body(self, ret: requests.Response, deadline: Optional[float]) -> Optional[bytes]:
+        """Reads the body of a streamed response. Returns None (and closes the response), if the deadline (perf_counter) passed"""
+        if deadline is None:
+            return ret.content
+
+        _remaining = deadline - time.perf_counter()
+        if _remaining <= 0:
+            ret.close()
+            return None
+
+        # A stalled read is interrupted at the deadline (urllib3 >= 2.3), a slowly sending server is caught by the check per chunk
+        _expired = threading.Event()
+
+        def _interrupt() -> None:
+            _expired.set()
+            try:
+                ret.raw.shutdown()
+            except Exception:
+                pass
+
+        _timer = threading.Timer(_remaining, _interrupt)
+        _timer.daemon = True
+        _timer.start()
+
+        _chunks = []
+        _read = getattr(ret.raw, "read1", None) or ret.raw.read
+        try:
+            while not _expired.is_set() and time.perf_counter() < deadline:
+                chunk = _read(65536, decode_content=True)
+                if not chunk:
+                    break
+                _chunks.append(chunk)
+        except Exception:
+            if not _expired.is_set() and time.perf_counter() < deadline:
+                raise
+        finally:
+            _timer.cancel()
+
+        if _expired.is_set() or time.perf_counter() >= deadline:
+            ret.close()
+            return None
+        return b"".join(_chunks)
+
+    def sync_incremental(
+        self,
+        endpoint_url: "str | EndpointPool",
+        typename: str,
+        returning_fields: List[str | Dict[str, Any]],
+        watermark_field: str,
+        primary_key: str,
+        state_file: str,
+        qry_filter: Optional[str] = "",
+        batch_size: Optional[int] = 1000,
+        bearer_token: Optional[str] = "",
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Fetches only the rows which changed since the last run, using a watermark field (e.g. updated_at) and the primary key for tie-breaking.
+
+        The rows are fetched in batches ordered by (watermark_field, primary_key) with keyset pagination. The cursor (last watermark and primary key)
+        is stored per typename and filter in state_file (JSON). Rows with a null watermark are not fetched. It is saved after a batch was processed by the caller, i.e. when the next batch is requested
+        or the iteration finishes. If the process crashes while processing a batch, the batch is fetched again on the next run.
+
+        Args:
+            endpoint_url (str | EndpointPool): URL of the GraphQL Endpoint or an EndpointPool, which selects the endpoint
+            typename (str): Name of the Query Type
+            returning_fields (List[Any]): List of fields which should be returned. watermark_field and primary_key are added, if missing.
+            watermark_field (str): Field which is increased on every change, e.g. updated_at
+            primary_key (str): Primary key field, used for tie-breaking of equal watermarks
+            state_file (str): Path to the file to store the cursors in
+            qry_filter (str, optional): Additional filter as String!! Defaults to "".
+            batch_size (int, optional): Amount of rows per request. Defaults to 1000.
+            bearer_token (str, optional): Bearer Token for Auth. Defaults to "".
+
+        Yields:
+            List[Dict[str, Any]]: Batches of changed rows
+
+        Examples:
+            >>> for rows in gq.sync_incremental(url, "articles", ["id", "title"], "updated_at", "id", "sync_state.json"):
+            ...     store(rows)
+
+        """
+        _fields = list(returning_fields)
+        for field in (watermark_field, primary_key):
+            if field not in _fields:
+                _fields.append(field)
+
+        _state_key = f"{typename}:{qry_filter}"
+        _order_by = "[{%s: asc}, {%s: asc}]" % (watermark_field, primary_key)
+
+        while True:
+            cursor = _load_state_file(state_file).get(_state_key)
+
+            _filters = [qry_filter] if qry_filter else []
+            # Rows without watermark cannot be synced incrementally. Hasura would also ignore a comparison with null (= match all rows).
+            _filters.append("{%s: {_is_null: false}}" % watermark_field)
+            if cursor is not None:
+                _watermark = json.dumps(cursor["watermark"], ensure_ascii=False)
+                _key = json.dumps(cursor["primary_key"], ensure_ascii=False)
+                _filters.append(
+                    "{_or: [{%s: {_gt: %s}}, {%s: {_eq: %s}, %s: {_gt: %s}}]}"
+                    % (watermark_field, _watermark, watermark_field, _watermark, primary_key, _key)
+                )
+            _filter = "{_and: [%s]}" % ", ".join(_filters)
+
+            qry = self.build_search_qry(typename, _filter, _fields, limit=batch_size, order_by=_order_by)
+            ret = self.execute_query(endpoint_url, qry, bearer_token=bearer_token)
+            if not ret:
+                logging.error("sync_incremental: Failed fetching %s, cursor was not moved" % typename)
+                return
+
+            rows = self.get_path(["data", typename], ret, fallback_return_value=[])
+            if not rows:
+                return
+
+            yield rows
+
+            if rows[-1].get(watermark_field) is None or rows[-1].get(primary_key) is None:
+                logging.error("sync_incremental: Missing %s or %s in the last row of %s, cursor was not moved" % (watermark_field, primary_key, typename))
+                return
+
+            # The caller processed the batch, so the cursor can be moved
+            state = _load_state_file(state_file)
+            state[_state_key] = {"watermark": rows[-1][watermark_field], "primary_key": rows[-1][primary_key]}
+            _save_state_file(state_file, state)
+
+            if len(rows) < batch_size:
+                return
+
+    def reset_sync_state(self, state_file: str, typename: str, qry_filter: Optional[str] = "") -> None:
+        """Removes the stored cursor of sync_incremental, so the next run fetches all rows again
+
+        Args:
+            state_file (str): Path to the file the cursors are stored in
+            typename (str): Name of the Query Type
+            qry_filter (str, optional): Filter used in sync_incremental. Defaults to "".
+
+        """
+        state = _load_state_file(state_file)
+        if state.pop(f"{typename}:{qry_filter}", None) is not None:
+            _save_state_file(state_file, state)
+
+
+class ChangeTracker:
+    """Optional change-detection layer for upserts, which skips records that did not change since the last (committed) run.
+
+    For every record the encoded mutation object (see GraphQLBuilder.build_graphQL_mutation_objects_from_dict) is hashed and stored per typename
+    and primary key in a local JSON file. Records with an unchanged hash are dropped before building the mutation.
+
+    The new hashes are only stored after commit() was called, so call it once the mutation was executed successfully.
+
+    Examples:
+        >>> tracker = ChangeTracker("hashes.json")
+        >>> objects = tracker.filter_changed("articles", records, typeschema, "id")
+        >>> if objects and gq.execute_query(url, gq.build_insert_mutation_qry("articles", objects, ["id"], "articles_pkey", ["title"])):
+        ...     tracker.commit()
+    """
+
+    def __init__(self, store_file: str, builder: Optional[GraphQLBuilder] = None) -> None:
+        """
+        Args:
+            store_file (str): Path to the file to store the hashes in
+            builder (GraphQLBuilder, optional): Builder used to encode the records. Defaults to a new GraphQLBuilder.
+        """
+        self.store_file = store_file
+        self._builder = builder or GraphQLBuilder()
+        self._hashes: Dict[str, Dict[str, str]] = _load_state_file(store_file)
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self.stats: Dict[str, int] = {"total": 0, "skipped": 0, "changed": 0}
+
+    def filter_changed(
+        self,
+        typename: str,
+        source_data: List[Dict[str, Any]],
+        typeschema: dict,
+        primary_key: str,
+        force_resend: Optional[bool] = False,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Builds the mutation objects of all changed records
+
+        Args:
+            typename (str): Name of the Type (without insert_)
+            source_data (List[Dict[str, Any]]): List of source dicts
+            typeschema (dict): The TypeSchema as Dict
+            primary_key (str): Field of the primary key in the source dict. Point seperated strings like 'meta.id' can be used for nested dicts.
+            force_resend (bool, optional): Return all records, even if they did not change. Their hashes are still updated on commit. Defaults to False.
+            **kwargs: Passed to build_graphQL_mutation_objects_from_dict (custom_mapping, ignore_fields, ...)
+
+        Returns:
+            List[str]: the created Mutation Objects of the changed records
+
+        """
+        _stored = self._hashes.get(typename, {})
+        _pending = self._pending.setdefault(typename, {})
+        _items = []
+
+        for record in source_data:
+            self.stats["total"] += 1
+            # build_graphQL_mutation_objects_from_dict can modify the source dict, so work on a copy
+            obj = self._builder.build_graphQL_mutation_objects_from_dict(copy.deepcopy(record), typeschema, **kwargs)
+            key = self._builder.get_path(primary_key.split("."), record)
+
+            if key is None:
+                logging.debug("ChangeTracker: Record without primary key %s, cannot be tracked" % primary_key)
+            else:
+                _hash = hashlib.sha256(obj.encode("utf-8")).hexdigest()
+                if not force_resend and _stored.get(str(key)) == _hash:
+                    self.stats["skipped"] += 1
+                    continue
+                _pending[str(key)] = _hash
+
+            self.stats["changed"] += 1
+            _items.append(obj)
+
+        return _items
+
+    def commit(self) -> None:
+        """Stores the hashes of all records returned by filter_changed since the last commit"""
+        for typename, hashes in self._pending.items():
+            self._hashes.setdefault(typename, {}).update(hashes)
+        self._pending = {}
+        _save_state_file(self.store_file, self._hashes)
+
+    def rollback(self) -> None:
+        """Discards the hashes of all records returned by filter_changed since the last commit, e.g. if the mutation failed"""
+        self._pending = {}
+
+    def reset(self, typename: Optional[str] = None) -> None:
+        """Removes the stored hashes, so all records are sent again
+
+        Args:
+            typename (str, optional): Only remove the hashes of this type. Defaults to None (all types).
+
+        """
+        if typename is None:
+            self._hashes = {}
+            self._pending = {}
+        else:
+            self._hashes.pop(typename, None)
+            self._pending.pop(typename, None)
+        _save_state_file(self.store_file, self._hashes)
+
+
+class EndpointPool:
+    """Routes queries to a set of read endpoints (e.g. Hasura read replicas), while mutations always go to the primary endpoint.
+
+    An EndpointPool can be used instead of an endpoint_url in execute_query and execute_many. Read endpoints are selected round-robin
+    or by the lowest (moving average) latency. An endpoint is ejected for eject_seconds after max_failures failed requests in a row
+    (connection errors or status codes >= 500). Afterwards it gets requests again and is re-ejected on the next failure.
+    check_health can be used to check all read endpoints actively via their health check path (/healthz for Hasura).
+
+    Examples:
+        >>> pool = EndpointPool("https://primary/v1/graphql", ["https://replica-1/v1/graphql", "https://replica-2/v1/graphql"])
+        >>> gq.execute_query(pool, gq.build_search_qry("articles", "", ["id"]))
+    """
+
+    def __init__(
+        self,
+        primary_url: str,
+        read_urls: Optional[List[str]] = None,
+        strategy: Optional[str] = "round_robin",
+        max_failures: Optional[int] = 3,
+        eject_seconds: Optional[float] = 30.0,
+        health_path: Optional[str] = "/healthz",
+    ) -> None:
+        """
+        Args:
+            primary_url (str): URL of the primary GraphQL Endpoint, used for mutations
+            read_urls (List[str], optional): URLs of the read endpoints. Defaults to None (only the primary endpoint).
+            strategy (str, optional): "round_robin" or "least_latency". Defaults to "round_robin".
+            max_failures (int, optional): Failed requests in a row after which an endpoint is ejected. Defaults to 3.
+            eject_seconds (float, optional): Time in seconds an endpoint stays ejected. Defaults to 30.0.
+            health_path (str, optional): Path of the health check, relative to the host of an endpoint. Defaults to "/healthz".
+        """
+        if strategy not in ("round_robin", "least_latency"):
+            raise ValueError("Unknown strategy %s, use round_robin or least_latency" % strategy)
+
+        self.primary_url = primary_url
+        self.read_urls = list(read_urls) if read_urls else [primary_url]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_path = health_path
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._state: Dict[str, Dict[str, Any]] = {
+            url: {"failures": 0, "ejected_until": 0.0, "latency": None} for url in set(self.read_urls + [primary_url])
+        }
+
+    def _is_read_only(self, qry: str) -> bool:
+        """Checks if a GraphQL document only contains queries (and fragments). Comments and strings are ignored."""
+        _text = re.sub(r'"""[\s\S]*?"""|"(?:\\.|[^"\\\n])*"', '""', qry)
+        _text = re.sub(r"#[^\n]*", "", _text)
+
+        # Collect the keyword of every top-level definition, an anonymous operation ({ ... }) is a query
+        _operations = []
+        _depth = 0
+        _expect_definition = True
+        for token in re.findall(r"[{}()]|[A-Za-z_]\w*", _text):
+            if token in ("{", "("):
+                if _depth == 0 and _expect_definition and token == "{":
+                    _operations.append("query")
+                    _expect_definition = False
+                _depth += 1
+            elif token in ("}", ")"):
+                _depth -= 1
+                if _depth == 0 and token == "}":
+                    _expect_definition = True
+            elif _depth == 0 and _expect_definition:
+                _operations.append(token)
+                _expect_definition = False
+
+        return "query" in _operations and all(op in ("query", "fragment") for op in _operations)
+
+    def get_endpoint(self, qry: str) -> str:
+        """Returns the endpoint to use for a query. Mutations (and documents which are not clearly read-only queries) always go to the primary endpoint.
+
+        If all read endpoints are ejected, the primary endpoint is used.
+
+        Args:
+            qry (str): Query to execute
+
+        Returns:
+            str: URL of the selected endpoint
+
+        """
+        if not self._is_read_only(qry):
+            return self.primary_url
+
+        now = time.monotonic()
+        with self._lock:
+            _available = [url for url in self.read_urls if self._state[url]["ejected_until"] <= now]
+            if not _available:
+                logging.warning("EndpointPool: All read endpoints are ejected, using the primary endpoint")
+                return self.primary_url
+
+            if self.strategy == "least_latency":
+                # Endpoints without measured latency are preferred, so every endpoint gets measured
+                return min(_available, key=lambda url: self._state[url]["latency"] or 0.0)
+
+            url = _available[self._next % len(_available)]
+            self._next += 1
+            return url
+
+    def report(self, url: str, success: bool, latency: Optional[float] = None) -> None:
+        """Reports the outcome of a request to an endpoint. Called by execute_query and execute_many.
+
+        Args:
+            url (str): URL of the endpoint
+            success (bool): False, if the endpoint failed (connection error or status code >= 500)
+            latency (float, optional): Duration of the request in seconds. Defaults to None.
+
+        """
+        with self._lock:
+            state = self._state.get(url)
+            if state is None:
+                return
+            if success:
+                state["failures"] = 0
+                state["ejected_until"] = 0.0
+                if latency is not None:
+                    # Exponential moving average, so single slow requests do not move the endpoint too much
+                    state["latency"] = latency if state["latency"] is None else 0.7 * state["latency"] + 0.3 * latency
+            else:
+                state["failures"] += 1
+                if state["failures"] >= self.max_failures:
+                    logging.warning("EndpointPool: Ejecting %s for %.1fs after %d failures" % (url, self.eject_seconds, state["failures"]))
+                    state["ejected_until"] = time.monotonic() + self.eject_seconds
+
+    def check_health(self, timeout: Optional[float] = 2.0) -> Dict[str, bool]:
+        """Checks the health of all read endpoints. Unhealthy endpoints are ejected, healthy endpoints are readmitted.
+
+        Args:
+            timeout (float, optional): Timeout of each health check in seconds. Defaults to 2.0.
+
+        Returns:
+            Dict[str, bool]: Health of every read endpoint
+
+        """
+        _health = {}
+        for url in self.read_urls:
+            _parts = urlsplit(url)
+            try:
+                ret = requests.get(f"{_parts.scheme}://{_parts.netloc}{self.health_path}", timeout=timeout, verify=False)
+                _health[url] = ret.status_code == 200
+            except Exception as e:
+                logging.error(f"==> Health check of {url} failed: {e}")
+                _health[url] = False
+
+            if _health[url]:
+                self.report(url, True)
+            else:
+                with self._lock:
+                    self._state[url]["failures"] = max(self._state[url]["failures"], self.max_failures)
+                    self._state[url]["ejected_until"] = time.monotonic() + self.eject_seconds
+        return _health
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the state (failures, ejected, latency) of every endpoint"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                url: {"failures": state["failures"], "ejected": state["ejected_until"] > now, "latency": state["latency"]}
+                for url, state in self._state.items()
+            }
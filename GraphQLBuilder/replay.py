@@ -0,0 +1,264 @@
+"""Replays a recording of GraphQLBuilder queries (see GraphQLBuilder.start_recording) against an endpoint for load testing.
+
+Usage:
+    python -m GraphQLBuilder.replay recording.jsonl --endpoint https://example.com/v1/graphql --concurrency 8
+    python -m GraphQLBuilder.replay recording.jsonl --mock-server --mock-latency 0.02 --rate 100
+"""
+import argparse
+import json
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from GraphQLBuilder import create_session
+
+
+class MockServer:
+    """Local GraphQL mock server, which answers every POST request with a static result after an artificial latency.
+
+    GET requests (e.g. /healthz) are answered with "OK".
+
+    Examples:
+        >>> with MockServer(latency=0.05) as server:
+        ...     gq.execute_query(server.url, qry)
+    """
+
+    def __init__(self, latency: Optional[float] = 0.0, error_rate: Optional[float] = 0.0, port: Optional[int] = 0) -> None:
+        """
+        Args:
+            latency (float, optional): Artificial latency in seconds per request. Defaults to 0.0.
+            error_rate (float, optional): Share of requests (0-1) which are answered with a GraphQL error. Defaults to 0.0.
+            port (int, optional): Port to listen on. Defaults to 0 (random free port).
+        """
+        _counter = {"requests": 0}
+        _lock = threading.Lock()
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with _lock:
+                    _counter["requests"] += 1
+                    # Spread the errors evenly over the requests
+                    _error = int(_counter["requests"] * error_rate) != int((_counter["requests"] - 1) * error_rate)
+                if latency:
+                    time.sleep(latency)
+                if _error:
+                    body = json.dumps({"errors": [{"message": "mock error"}]}).encode()
+                else:
+                    body = json.dumps({"data": {"mock": True}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                # Health check endpoint like /healthz of Hasura
+                body = b"OK"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._counter = _counter
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self.url = "http://127.0.0.1:%d/v1/graphql" % self._server.server_address[1]
+
+    @property
+    def request_count(self) -> int:
+        """Amount of GraphQL (POST) requests answered so far"""
+        return self._counter["requests"]
+
+    def start(self) -> "MockServer":
+        """Starts the server in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+
+def load_recording(record_file: str) -> List[Dict[str, Any]]:
+    """Loads a recording created by GraphQLBuilder.start_recording
+
+    Args:
+        record_file (str): Path to the recording
+
+    Returns:
+        List[Dict[str, Any]]: Recorded queries
+
+    """
+    entries = []
+    with open(record_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Returns the percentile (0-100) of the values, using the nearest rank"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+def replay(
+    entries: List[Dict[str, Any]],
+    endpoint_url: str,
+    bearer_token: Optional[str] = "",
+    concurrency: Optional[int] = 4,
+    rate: Optional[float] = None,
+    timeout: Optional[float] = 30,
+) -> Dict[str, Any]:
+    """Replays the recorded queries against an endpoint and returns a report
+
+    Args:
+        entries (List[Dict[str, Any]]): Recorded queries, see load_recording
+        endpoint_url (str): URL of the GraphQL Endpoint
+        bearer_token (str, optional): Bearer Token for Auth. Defaults to "".
+        concurrency (int, optional): Amount of parallel requests. Defaults to 4.
+        rate (float, optional): Requests per second. Defaults to None (as fast as the concurrency allows).
+        timeout (float, optional): Timeout in seconds per request. Defaults to 30.
+
+    Returns:
+        Dict[str, Any]: Report with requests, errors, error_rate, duration, throughput and latency percentiles (in seconds).
+            If rate is set, the latency is measured from the scheduled start of every request and the report also contains
+            target_rate, schedule_lag_max (how far requests were sent behind schedule) and behind_schedule.
+
+    """
+    session = create_session(concurrency)
+
+    _headers = {
+        "content-type": "application/json",
+    }
+
+    if bearer_token != "":
+        _headers["Authorization"] = f"{bearer_token}"
+
+    def _execute(index: int) -> Dict[str, Any]:
+        entry = entries[index]
+        _request_start = time.perf_counter()
+        if rate:
+            # Wait for the time slot of this request. The latency is measured from the slot, so waiting for a free worker
+            # (= the endpoint cannot keep up with the rate) is part of the latency.
+            _request_start = _start + index / rate
+            _delay = _request_start - time.perf_counter()
+            if _delay > 0:
+                time.sleep(_delay)
+        _lag = max(0.0, time.perf_counter() - _request_start)
+
+        _payload: Dict[str, Any] = {"query": entry["query"]}
+        if entry.get("variables") is not None:
+            _payload["variables"] = entry["variables"]
+
+        try:
+            ret = session.post(endpoint_url, json=_payload, headers=_headers, verify=False, timeout=timeout)
+            error = ret.status_code != 200 or ret.json().get("errors") is not None
+        except Exception as e:
+            logging.debug(f"==> {e}")
+            error = True
+        return {"latency": time.perf_counter() - _request_start, "lag": _lag, "error": error}
+
+    _start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(_execute, range(len(entries))))
+    duration = time.perf_counter() - _start
+
+    latencies = [r["latency"] for r in results]
+    errors = sum(1 for r in results if r["error"])
+    schedule_lag_max = max((r["lag"] for r in results), default=0.0) if rate else 0.0
+
+    # More than one slot behind schedule means the requests were not sent at the target rate
+    behind_schedule = bool(rate) and schedule_lag_max > 1 / rate
+    if behind_schedule:
+        logging.warning(
+            "replay: Fell behind schedule by up to %.3fs, the target rate of %.1f req/s was not reached. Increase the concurrency."
+            % (schedule_lag_max, rate)
+        )
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "duration": duration,
+        "throughput": len(results) / duration if duration > 0 else 0.0,
+        "target_rate": rate,
+        "schedule_lag_max": schedule_lag_max,
+        "behind_schedule": behind_schedule,
+        "latency_p50": _percentile(latencies, 50),
+        "latency_p90": _percentile(latencies, 90),
+        "latency_p99": _percentile(latencies, 99),
+        "latency_max": max(latencies) if latencies else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a GraphQLBuilder recording against an endpoint.")
+    parser.add_argument("record_file", help="Recording created by GraphQLBuilder.start_recording")
+    parser.add_argument("--endpoint", help="URL of the GraphQL Endpoint")
+    parser.add_argument("--bearer-token", default="", help="Bearer Token for Auth")
+    parser.add_argument("--concurrency", type=int, default=4, help="Amount of parallel requests")
+    parser.add_argument("--rate", type=float, default=None, help="Requests per second (default: unlimited)")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the recording n times")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout in seconds per request")
+    parser.add_argument("--mock-server", action="store_true", help="Replay against a bundled local mock server")
+    parser.add_argument("--mock-latency", type=float, default=0.0, help="Artificial latency of the mock server in seconds")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0, help="Share of requests (0-1) the mock server answers with an error")
+    args = parser.parse_args(argv)
+
+    if not args.endpoint and not args.mock_server:
+        parser.error("either --endpoint or --mock-server is required")
+
+    entries = load_recording(args.record_file) * args.repeat
+
+    server = None
+    endpoint_url = args.endpoint
+    if args.mock_server:
+        server = MockServer(latency=args.mock_latency, error_rate=args.mock_error_rate).start()
+        endpoint_url = server.url
+
+    try:
+        report = replay(entries, endpoint_url, args.bearer_token, args.concurrency, args.rate, args.timeout)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print("requests:    %d" % report["requests"])
+    print("errors:      %d (%.2f%%)" % (report["errors"], report["error_rate"] * 100))
+    print("duration:    %.3fs" % report["duration"])
+    if report["target_rate"]:
+        print("throughput:  %.1f req/s (target %.1f req/s)" % (report["throughput"], report["target_rate"]))
+        print("max lag:     %.1fms behind schedule" % (report["schedule_lag_max"] * 1000))
+    else:
+        print("throughput:  %.1f req/s" % report["throughput"])
+    print("latency p50: %.1fms" % (report["latency_p50"] * 1000))
+    print("latency p90: %.1fms" % (report["latency_p90"] * 1000))
+    print("latency p99: %.1fms" % (report["latency_p99"] * 1000))
+    print("latency max: %.1fms" % (report["latency_max"] * 1000))
+    if report["behind_schedule"]:
+        print("WARNING: the replay fell behind schedule, the endpoint or the concurrency could not keep up with the target rate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark execute_query (sequential) against execute_many (thread pool).
+
+Starts the local mock server of GraphQLBuilder.replay, which answers every GraphQL request after an artificial latency.
+
+Usage:
+    python benchmarks/bench_execute_many.py --queries 50 --latency 0.05 --max-workers 8
+"""
+import argparse
+import os
+import sys
+import time
+
+# Allow running the script from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import GraphQLBuilder
+from GraphQLBuilder.replay import MockServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="Artificial server latency in seconds")
+    parser.add_argument("--max-workers", type=int, default=8)
+    args = parser.parse_args()
+
+    gq = GraphQLBuilder.GraphQLBuilder()
+    queries = [gq.build_search_qry("test_endpoint", "{id: {_eq: %d}}" % i, ["id"]) for i in range(args.queries)]
+
+    with MockServer(latency=args.latency) as server:
+        start = time.perf_counter()
+        for qry in queries:
+            gq.execute_query(server.url, qry)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gq.execute_many(server.url, queries, max_workers=args.max_workers)
+        parallel = time.perf_counter() - start
+
+    print("queries: %d, latency: %.3fs, max_workers: %d" % (args.queries, args.latency, args.max_workers))
+    print("execute_query (sequential): %.3fs" % sequential)
+    print("execute_many (thread pool): %.3fs (%.1fx)" % (parallel, sequential / parallel))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,12 @@ setup(
         'requests>=2.26.0',
         'types-requests>=2.26.0',
         ],
+    extras_require={
+        'pandas': ['pandas'],
+        },
+    entry_points={
+        'console_scripts': ['graphqlbuilder-replay=GraphQLBuilder.replay:main'],
+        },
     packages=find_packages(),
     tests_require=['pytest'],
     description='GraphQL Query Builder with focus on hasura.io',
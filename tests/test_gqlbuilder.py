@@ -1,5 +1,10 @@
 import GraphQLBuilder
+import GraphQLBuilder.replay
+import pickle
 import requests
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from requests_mock.mocker import Mocker
 from typing import Any, List
 
@@ -12,6 +17,21 @@ def test_creation_class_object():
     gz = GraphQLBuilder.GraphQLBuilder()
     assert gz != None
 
+
+def test_pickle_class_object(requests_mock: Mocker, tmp_path):
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    # Test pickling a builder which has a session and an active recording
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {}})
+    gz.execute_many("https://test.com/v1/graphql", ["query"])
+    gz.start_recording(str(tmp_path / "recording.jsonl"))
+
+    gz_copy = pickle.loads(pickle.dumps(gz))
+    gz.stop_recording()
+    assert gz_copy._record_file is None
+    assert gz_copy.execute_many("https://test.com/v1/graphql", ["query"]) == [{"data": {}}]
+    assert pickle.loads(pickle.dumps(gz.build_search_qry))("test_endpoint", "", ["id"]) == gz.build_search_qry("test_endpoint", "", ["id"])
+
 def test_get_path():
     gz = GraphQLBuilder.GraphQLBuilder()
 
@@ -144,6 +164,16 @@ def test_build_search_query():
     )
     assert _cmp(qry, "query SearchQuery { test_endpoint(limit 10, where: {id: {_eq: 1}}) {id name age}}") == True
 
+    # Test working query with filter and order_by
+    qry = gz.build_search_qry(
+        "test_endpoint",
+        "{id: {_eq: 1}}",
+        ["id", "name", "age"],
+        10,
+        order_by="[{age: asc}, {id: asc}]",
+    )
+    assert _cmp(qry, "query SearchQuery { test_endpoint(limit 10, where: {id: {_eq: 1}}, order_by: [{age: asc}, {id: asc}]) {id name age}}") == True
+
     # Test working query with where clause (=filter) and nested dict
     qry = gz.build_search_qry(
         "test_endpoint",
@@ -321,4 +351,472 @@ def test_execute_query(requests_mock: Mocker):
         qry,
         bearer_token="test_token"
     )
-    assert response == {}
\ No newline at end of file
+    assert response == {}
+
+def test_execute_many(requests_mock: Mocker):
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    def _callback(request, context):
+        return {"data": {"echo": request.json()["query"]}}
+
+    # Test working requests, results are returned in order
+    requests_mock.post('https://test.com/v1/graphql', json=_callback)
+    queries = ["query_%d" % i for i in range(20)]
+    response = gz.execute_many(
+        "https://test.com/v1/graphql",
+        queries,
+        bearer_token="test_token",
+        max_workers=5,
+    )
+    assert [r["data"]["echo"] for r in response] == queries
+    assert requests_mock.last_request.headers["Authorization"] == "test_token"
+
+    # Test empty input
+    assert gz.execute_many("https://test.com/v1/graphql", []) == []
+
+    # Test errors are collected per query
+    requests_mock.post('https://test.com/v1/graphql', [
+        {"json": {"data": {"ok": True}}},
+        {"status_code": 404},
+        {"exc": requests.exceptions.ConnectTimeout},
+        {"json": {"errors": [{"message": "test_error"}]}},
+    ])
+    response = gz.execute_many("https://test.com/v1/graphql", ["a", "b", "c", "d"], max_workers=1, timeout=1)
+    assert response[0] == {"data": {"ok": True}}
+    assert "404" in response[1]["errors"][0]["message"]
+    assert response[2]["errors"][0]["message"].startswith("Timeout")
+    assert response[3] == {"errors": [{"message": "test_error"}]}
+
+
+def test_get_columns_from_result():
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    _mock_result = {"data": {"test_endpoint": [
+        {"id": 1, "name": {"firstname": "foo", "lastname": "bar"}, "tags": [{"tag": "a"}, {"tag": "b"}]},
+        {"id": 2, "name": {"firstname": "baz", "lastname": None}, "tags": []},
+    ]}}
+
+    # Test with returning fields
+    columns = gz.get_columns_from_result(
+        _mock_result,
+        "test_endpoint",
+        ["id", {"name": ["firstname", "lastname"]}, {"tags": ["tag"]}],
+    )
+    assert columns == {
+        "id": [1, 2],
+        "name.firstname": ["foo", "baz"],
+        "name.lastname": ["bar", None],
+        "tags.tag": [["a", "b"], []],
+    }
+
+    # Test empty result still has all columns
+    columns = gz.get_columns_from_result({}, "test_endpoint", ["id, age", {"name": ["firstname"]}])
+    assert columns == {"id": [], "age": [], "name.firstname": []}
+
+    # Test nested selection strings and duplicate fields
+    columns = gz.get_columns_from_result(
+        _mock_result,
+        "test_endpoint",
+        ["id", "name { firstname }", "tags(limit: 1) { tag }", "id"],
+    )
+    assert columns == {"id": [1, 2], "name.firstname": ["foo", "baz"], "tags.tag": [["a", "b"], []]}
+
+    # Test aliases are named like the key in the response
+    columns = gz.get_columns_from_result(
+        {"data": {"test_endpoint": [{"n": "foo", "id": 1, "author": {"first": "bar"}}]}},
+        "test_endpoint",
+        ["n: name", "id", "author: name { first: firstname }"],
+    )
+    assert columns == {"n": ["foo"], "id": [1], "author.first": ["bar"]}
+
+    # Test broken selection strings are ignored
+    columns = gz.get_columns_from_result(_mock_result, "test_endpoint", ["id", "name { firstname"])
+    assert columns == {"id": [1, 2]}
+
+    # Test without returning fields from an iterable of rows, missing values are None
+    columns = gz.get_columns_from_result(iter([{"id": 1}, {"id": 2, "data": {"age": 42}}]))
+    assert columns == {"id": [1, 2], "data.age": [None, 42]}
+
+    # Test nested objects which are null in some rows
+    columns = gz.get_columns_from_result(iter([{"id": 1, "name": None}, {"id": 2, "name": {"first": "foo"}}, {"id": 3, "name": None}]))
+    assert columns == {"id": [1, 2, 3], "name.first": [None, "foo", None]}
+
+
+def test_sync_incremental(requests_mock: Mocker, tmp_path):
+    gz = GraphQLBuilder.GraphQLBuilder()
+    state_file = str(tmp_path / "sync_state.json")
+
+    requests_mock.post('https://test.com/v1/graphql', [
+        {"json": {"data": {"test_endpoint": [{"id": 1, "updated_at": "2023-01-01"}, {"id": 2, "updated_at": "2023-01-01"}]}}},
+        {"json": {"data": {"test_endpoint": [{"id": 3, "updated_at": "2023-01-02"}]}}},
+    ])
+
+    # Test the first run fetches everything, ordered and paginated
+    batches = list(gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file, batch_size=2))
+    assert [[r["id"] for r in rows] for rows in batches] == [[1, 2], [3]]
+    qry = requests_mock.request_history[0].json()["query"]
+    assert "order_by: [{updated_at: asc}, {id: asc}]" in qry
+    assert "where: {_and: [{updated_at: {_is_null: false}}]}" in qry
+    assert "_gt" in requests_mock.request_history[1].json()["query"]
+
+    # Test the next run only fetches rows past the stored watermark
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {"test_endpoint": []}})
+    assert list(gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file)) == []
+    assert '{_or: [{updated_at: {_gt: "2023-01-02"}}, {updated_at: {_eq: "2023-01-02"}, id: {_gt: 3}}]}' in requests_mock.last_request.json()["query"]
+
+    # Test a crash while processing a batch does not move the cursor
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {"test_endpoint": [{"id": 4, "updated_at": "2023-01-03"}]}})
+    sync = gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file)
+    next(sync)
+    sync.close()
+    list(gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file))
+    assert 'id: {_gt: 3}' in requests_mock.request_history[-1].json()["query"]
+
+    # Test a failed request stops the sync
+    requests_mock.post('https://test.com/v1/graphql', status_code=500)
+    assert list(gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file)) == []
+
+    # Test the reset
+    gz.reset_sync_state(state_file, "test_endpoint")
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {"test_endpoint": []}})
+    list(gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file))
+    assert "_gt" not in requests_mock.last_request.json()["query"]
+
+    # Test a null watermark is never stored as cursor
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {"test_endpoint": [{"id": 1, "updated_at": "2023-01-01"}, {"id": 2, "updated_at": None}]}})
+    batches = list(gz.sync_incremental("https://test.com/v1/graphql", "test_endpoint", ["id"], "updated_at", "id", state_file, batch_size=2))
+    assert len(batches) == 1
+    assert requests_mock.call_count == 8
+    assert GraphQLBuilder._load_state_file(state_file) == {}
+
+
+def test_change_tracker(tmp_path):
+    store_file = str(tmp_path / "hashes.json")
+    _type_schema = {"id": "Int", "name": "String"}
+    _mock_data = [{"id": 1, "name": "foo"}, {"id": 2, "name": "bar"}]
+
+    # Test the first run sends everything
+    tracker = GraphQLBuilder.ChangeTracker(store_file)
+    assert tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id") == ['{id: 1, name: "foo"}', '{id: 2, name: "bar"}']
+    tracker.commit()
+
+    # Test unchanged records are skipped, also after reloading the store
+    tracker = GraphQLBuilder.ChangeTracker(store_file)
+    _mock_data[1]["name"] = "baz"
+    assert tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id") == ['{id: 2, name: "baz"}']
+    assert tracker.stats == {"total": 2, "skipped": 1, "changed": 1}
+
+    # Test rollback does not store the hashes
+    tracker.rollback()
+    assert len(tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id")) == 1
+
+    # Test force resend and reset
+    assert len(tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id", force_resend=True)) == 2
+    tracker.commit()
+    assert tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id") == []
+    tracker.reset("test_endpoint")
+    assert len(tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id")) == 2
+
+    # Test reset also drops the pending hashes
+    tracker.reset("test_endpoint")
+    tracker.commit()
+    assert len(tracker.filter_changed("test_endpoint", _mock_data, _type_schema, "id")) == 2
+
+    # Test kwargs are passed and records without primary key are always sent
+    tracker = GraphQLBuilder.ChangeTracker(store_file)
+    assert tracker.filter_changed("other_endpoint", [{"name": "foo"}], _type_schema, "id", ignore_fields=["name"]) == ["{}"]
+
+
+def test_recording(requests_mock: Mocker, tmp_path):
+    gz = GraphQLBuilder.GraphQLBuilder()
+    record_file = str(tmp_path / "recording.jsonl")
+
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {"test_endpoint": [{"id": 1}]}})
+
+    # Test queries are only recorded while recording is active
+    gz.execute_query("https://test.com/v1/graphql", "query_one")
+    gz.start_recording(record_file)
+    gz.execute_query("https://test.com/v1/graphql", "query_two", variables={"id": 1})
+    gz.execute_many("https://test.com/v1/graphql", ["query_three"])
+    requests_mock.post('https://test.com/v1/graphql', status_code=500)
+    gz.execute_query("https://test.com/v1/graphql", "query_four")
+    gz.stop_recording()
+    gz.execute_query("https://test.com/v1/graphql", "query_five")
+
+    entries = GraphQLBuilder.replay.load_recording(record_file)
+    assert [e["query"] for e in entries] == ["query_two", "query_three", "query_four"]
+    assert entries[0]["variables"] == {"id": 1}
+    assert entries[0]["status_code"] == 200
+    assert entries[0]["response_size"] > 0
+    assert entries[0]["error"] is None
+    assert entries[2]["error"] == "HTTP status code 500"
+
+
+def test_replay():
+    entries = [{"query": "query_%d" % i, "variables": None} for i in range(20)]
+
+    # Test replay against the mock server with errors
+    with GraphQLBuilder.replay.MockServer(latency=0.01, error_rate=0.25) as server:
+        report = GraphQLBuilder.replay.replay(entries, server.url, concurrency=4)
+    assert report["requests"] == 20
+    assert report["errors"] == 5
+    assert report["error_rate"] == 0.25
+    assert report["latency_p50"] >= 0.01
+    assert report["latency_p50"] <= report["latency_p99"] <= report["latency_max"]
+
+    # Test the rate limit
+    with GraphQLBuilder.replay.MockServer() as server:
+        report = GraphQLBuilder.replay.replay(entries[:5], server.url, concurrency=5, rate=50)
+    assert report["duration"] >= 4 / 50
+    assert report["target_rate"] == 50
+    assert report["behind_schedule"] == False
+
+    # Test a saturated endpoint: the latency includes the time behind schedule
+    with GraphQLBuilder.replay.MockServer(latency=0.1) as server:
+        report = GraphQLBuilder.replay.replay(entries[:10], server.url, concurrency=1, rate=100)
+    assert report["behind_schedule"] == True
+    assert report["throughput"] < 15
+    assert report["schedule_lag_max"] > 0.7
+    assert report["latency_max"] > 0.8
+
+
+def test_build_nested_insert_mutation_query():
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    _mock_data = {
+        "id": 1,
+        "title": "test",
+        "publisher": {"name": "foo"},
+        "authors": [{"name": "bar", "age": 42}, {"name": "baz", "age": 23}],
+        "tags": [],
+    }
+
+    _type_schema = {
+        "id": "Int",
+        "title": "String",
+        "publisher": {"name": "String"},
+        "authors": {
+            "name": "String",
+            "age": "Int",
+            "_on_conflict": {"constraint": "authors_pkey", "update_columns": ["age"]},
+        },
+        "tags": {"tag": "String"},
+    }
+
+    mutation_objects: str = gz.build_graphQL_mutation_objects_from_dict(_mock_data, _type_schema)
+    assert mutation_objects == (
+        '{id: 1, title: "test", publisher: {data: {name: "foo"}}, '
+        'authors: {data: [{name: "bar", age: 42}, {name: "baz", age: 23}], on_conflict: {constraint: authors_pkey, update_columns: [age]}}, '
+        'tags: {data: []}}'
+    )
+
+    # The typeschema is not modified
+    assert "_on_conflict" in _type_schema["authors"]
+
+    # Test broken nested data is skipped
+    mutation_objects = gz.build_graphQL_mutation_objects_from_dict({"id": 1, "publisher": "foo", "authors": ["foo"]}, _type_schema)
+    assert mutation_objects == '{id: 1, authors: {data: [], on_conflict: {constraint: authors_pkey, update_columns: [age]}}}'
+
+    # Test on_conflict without constraint is ignored
+    mutation_objects = gz.build_graphQL_mutation_objects_from_dict(
+        {"id": 1, "authors": [{"name": "bar"}]},
+        {"id": "Int", "authors": {"name": "String", "_on_conflict": {"update_columns": ["name"]}}},
+    )
+    assert mutation_objects == '{id: 1, authors: {data: [{name: "bar"}]}}'
+
+    # Test the nested objects in an insert mutation with nested returning fields
+    qry = gz.build_insert_mutation_qry(
+        "articles",
+        [gz.build_graphQL_mutation_objects_from_dict(_mock_data, _type_schema)],
+        ["id", "authors { id }"],
+    )
+    assert "mutation InsertInto" in qry
+    assert "authors: {data: [{name: \"bar\", age: 42}" in qry
+
+
+def test_build_update_many_query():
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    _updates = [
+        {"where": "{id: {_eq: 1}}", "_set": '{name: "foo"}'},
+        {"where": "{id: {_eq: 2}}", "_inc": "{count: 1}"},
+        {"where": "{id: {_eq: 3}}", "_set": '{name: "bar"}', "_inc": "{count: 2}"},
+    ]
+
+    # Test a working query
+    qry = gz.build_update_many_qry("test_endpoint", _updates)
+    assert len(qry) == 1
+    assert _cmp(qry[0], 'mutation UpdateMany { update_test_endpoint_many( updates: [{where: {id: {_eq: 1}}, _set: {name: "foo"}}, {where: {id: {_eq: 2}}, _inc: {count: 1}}, {where: {id: {_eq: 3}}, _set: {name: "bar"}, _inc: {count: 2}}]) {affected_rows}}') == True
+
+    # Test chunks and returning fields
+    qry = gz.build_update_many_qry("test_endpoint", _updates, ["id", "name"], chunk_size=2)
+    assert len(qry) == 2
+    assert _cmp(qry[1], 'mutation UpdateMany { update_test_endpoint_many( updates: [{where: {id: {_eq: 3}}, _set: {name: "bar"}, _inc: {count: 2}}]) {affected_rows returning { id name }}}') == True
+
+    # Test missing where clause
+    assert gz.build_update_many_qry("test_endpoint", [{"_set": '{name: "foo"}'}]) == []
+
+
+def test_execute_update_many(requests_mock: Mocker):
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    _updates = [{"where": "{id: {_eq: %d}}" % i, "_set": '{name: "foo"}'} for i in range(5)]
+
+    # Test affected rows per update, the second chunk fails
+    requests_mock.post('https://test.com/v1/graphql', [
+        {"json": {"data": {"update_test_endpoint_many": [{"affected_rows": 1}, {"affected_rows": 0}]}}},
+        {"status_code": 500},
+        {"json": {"data": {"update_test_endpoint_many": [{"affected_rows": 3}]}}},
+    ])
+    affected_rows = gz.execute_update_many("https://test.com/v1/graphql", "test_endpoint", _updates, chunk_size=2)
+    assert affected_rows == [1, 0, None, None, 3]
+    assert requests_mock.call_count == 3
+
+    # Test updates without where clause only fail themselves
+    requests_mock.post('https://test.com/v1/graphql', json={"data": {"update_test_endpoint_many": [{"affected_rows": 1}]}})
+    affected_rows = gz.execute_update_many("https://test.com/v1/graphql", "test_endpoint", [{"_set": '{name: "foo"}'}, _updates[0]])
+    assert len(affected_rows) == 2
+    assert affected_rows == [None, 1]
+
+
+def test_build_aggregate_query():
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    # Test count only
+    qry = gz.build_aggregate_qry("test_endpoint")
+    assert _cmp(qry, "query AggregateQuery { test_endpoint_aggregate { aggregate { count } } }") == True
+
+    # Test with filter, aggregate functions and nodes
+    qry = gz.build_aggregate_qry(
+        "test_endpoint",
+        "{id: {_gt: 1}}",
+        count=["age"],
+        sum=["age"],
+        max=["age", "updated_at"],
+        nodes=["id", {"name": ["firstname"]}],
+    )
+    assert _cmp(qry, "query AggregateQuery { test_endpoint_aggregate(where: {id: {_gt: 1}}) { aggregate { count(columns: [age]) sum { age } max { age updated_at } } nodes { id name { firstname } } } }") == True
+
+    # Test groups
+    qry = gz.build_aggregate_qry(
+        "test_endpoint",
+        "{id: {_gt: 1}}",
+        groups={"young": "{age: {_lt: 30}}", "old": "{age: {_gte: 30}}"},
+    )
+    assert _cmp(qry, "query AggregateQuery { young: test_endpoint_aggregate(where: {_and: [{id: {_gt: 1}}, {age: {_lt: 30}}]}) { aggregate { count } } old: test_endpoint_aggregate(where: {_and: [{id: {_gt: 1}}, {age: {_gte: 30}}]}) { aggregate { count } } }") == True
+
+    # Test nothing to aggregate and broken nodes
+    assert gz.build_aggregate_qry("test_endpoint", count=False) == ""
+    assert gz.build_aggregate_qry("test_endpoint", nodes=[{"a": ["b"], "c": ["d"]}]) == ""
+
+
+def test_get_aggregate_from_result():
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    _mock_result = {"data": {"test_endpoint_aggregate": {"aggregate": {"count": 42, "sum": {"age": 1337}}}}}
+    assert gz.get_aggregate_from_result(_mock_result, "test_endpoint") == {"count": 42, "sum": {"age": 1337}}
+
+    _mock_result = {"data": {"young": {"aggregate": {"count": 1}}, "old": {"aggregate": {"count": 2}}}}
+    assert gz.get_aggregate_from_result(_mock_result, "test_endpoint", group="old") == {"count": 2}
+
+    # Test fallback
+    assert gz.get_aggregate_from_result({}, "test_endpoint") == {}
+
+
+def test_endpoint_pool():
+    gz = GraphQLBuilder.GraphQLBuilder()
+    primary = GraphQLBuilder.replay.MockServer().start()
+    replicas = [GraphQLBuilder.replay.MockServer().start() for _ in range(3)]
+
+    try:
+        pool = GraphQLBuilder.EndpointPool(primary.url, [r.url for r in replicas], max_failures=1, eject_seconds=60)
+        qry = gz.build_search_qry("test_endpoint", "", ["id"])
+
+        # Test round robin over the read endpoints, mutations go to the primary
+        for _ in range(6):
+            assert gz.execute_query(pool, qry) == {"data": {"mock": True}}
+        gz.execute_query(pool, gz.build_delete_qry("test_endpoint", "{id: {_eq: 1}}"))
+        assert [r.request_count for r in replicas] == [2, 2, 2]
+        assert primary.request_count == 1
+
+        # Test execute_many with a pool
+        gz.execute_many(pool, [qry] * 6, max_workers=3)
+        assert [r.request_count for r in replicas] == [4, 4, 4]
+
+        # Test failing endpoints are ejected
+        replicas[0].stop()
+        assert gz.execute_query(pool, qry) == {}
+        assert pool.get_stats()[replicas[0].url]["ejected"] == True
+        for _ in range(4):
+            gz.execute_query(pool, qry)
+        assert [r.request_count for r in replicas[1:]] == [6, 6]
+
+        # Test health checks
+        assert pool.check_health(timeout=1) == {replicas[0].url: False, replicas[1].url: True, replicas[2].url: True}
+
+        # Test the primary is used, if all read endpoints are ejected
+        pool = GraphQLBuilder.EndpointPool(primary.url, [replicas[0].url])
+        pool.check_health(timeout=1)
+        assert pool.get_endpoint(qry) == primary.url
+
+        # Test mutations after comments or fragments go to the primary, queries with comments, strings and fragments to the read endpoints
+        pool = GraphQLBuilder.EndpointPool(primary.url, [replicas[1].url])
+        assert pool.get_endpoint("# c\nmutation { delete_test_endpoint(where: {}) { affected_rows } }") == primary.url
+        assert pool.get_endpoint("fragment f on test_endpoint { id }\nmutation { insert_test_endpoint(objects: []) { returning { ...f } } }") == primary.url
+        assert pool.get_endpoint("query A { a { id } } mutation B { delete_a(where: {}) { affected_rows } }") == primary.url
+        assert pool.get_endpoint("subscription { test_endpoint { id } }") == primary.url
+        assert pool.get_endpoint("") == primary.url
+        assert pool.get_endpoint("# mutation\nfragment f on test_endpoint { id }\nquery Q($id: Int) { test_endpoint(where: {name: {_eq: \"mutation }\"}}) { ...f } }") == replicas[1].url
+        assert pool.get_endpoint("{ test_endpoint { id } }") == replicas[1].url
+
+        # Test least latency
+        pool = GraphQLBuilder.EndpointPool(primary.url, [r.url for r in replicas[1:]], strategy="least_latency")
+        pool.report(replicas[1].url, True, 0.5)
+        pool.report(replicas[2].url, True, 0.1)
+        assert pool.get_endpoint(qry) == replicas[2].url
+    finally:
+        primary.stop()
+        for r in replicas[1:]:
+            r.stop()
+
+
+def test_execute_many_timeout():
+    gz = GraphQLBuilder.GraphQLBuilder()
+
+    class _SlowDripHandler(BaseHTTPRequestHandler):
+        """Sends the response body one byte every 0.1s"""
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = b'{"data": {"test_endpoint": []}}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                for i in range(len(body)):
+                    self.wfile.write(body[i:i + 1])
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowDripHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d/v1/graphql" % server.server_address[1]
+
+    try:
+        # Test the timeout is a deadline for the whole query, not per socket read
+        start = time.perf_counter()
+        response = gz.execute_many(url, ["query"], timeout=0.5)
+        assert time.perf_counter() - start < 1.0
+        assert response[0]["errors"][0]["message"].startswith("Timeout")
+
+        # Test the same server works without timeout
+        assert gz.execute_many(url, ["query"]) == [{"data": {"test_endpoint": []}}]
+    finally:
+        server.shutdown()
+        server.server_close()